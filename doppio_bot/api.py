@@ -1,11 +1,11 @@
 import frappe
 from langchain_google_genai import ChatGoogleGenerativeAI # Changed from langchain.llms import OpenAI
-from langchain.memory import RedisChatMessageHistory, ConversationBufferMemory
+from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
-from langchain.agents import tool, AgentType, initialize_agent
+from langchain.agents import tool, AgentExecutor, ConversationalAgent
+from langchain.chains import LLMChain
 from datetime import date
 from pydantic import BaseModel, model_validator
-from langchain.schema import SystemMessage
 from langdetect import detect, DetectorFactory
 from frappe import log_error 
 from typing import Optional, Dict
@@ -16,6 +16,11 @@ import logging # Was imported twice, removed one
 import calendar
 # import os # No longer needed for OPENAI_API_KEY
 import json # Added for create_sales_invoice parsing
+from doppio_bot.export import export_query_to_file
+from doppio_bot.prompts import get_agent_configuration
+from doppio_bot.tool_selection import get_previous_human_message, select_tools
+from doppio_bot.history import get_chat_message_history, touch_session
+from doppio_bot.usage import TokenUsageCallbackHandler, is_token_budget_exceeded, record_usage
 
 # Asegurar resultados consistentes en la detección de idioma
 DetectorFactory.seed = 0
@@ -53,50 +58,73 @@ def is_erpnext_related(prompt_message: str) -> bool:
 
 @frappe.whitelist()
 def get_chatbot_response(session_id: str, prompt_message: str) -> str:
-    google_api_key = frappe.conf.get("google_api_key") or frappe.get_site_config().get("google_api_key")
-    # os.environ["OPENAI_API_KEY"] = openai_api_key  # Removed
-
-    google_model_name = get_model_from_settings() # Changed from openai_model
-
-    if not google_api_key:
-        frappe.throw("Please set `google_api_key` in site config") # Changed from openai_api_key
+    google_api_key = get_google_api_key()
 
     if not is_erpnext_related(prompt_message):
         return "Lo siento, solo puedo responder preguntas relacionadas con ERPNext. ¿En qué más puedo ayudarte?"
-    
+
+    if is_token_budget_exceeded():
+        return "Lo siento, se alcanzó el límite diario de uso del asistente. Intenta de nuevo mañana."
+
+    # Restaura la sesión si fue archivada y la marca como activa para la expiración por inactividad
+    touch_session(session_id)
+    message_history = get_chat_message_history(session_id)
+
+    return run_agent(session_id, prompt_message, message_history, google_api_key=google_api_key)
+
+def run_agent(session_id: str, prompt_message: str, message_history, google_api_key: Optional[str] = None, callbacks: Optional[list] = None) -> str:
+    """
+    Runs one agent turn with the tools relevant to the message. Shared by the chat page and the batch mode;
+    token usage is recorded under `session_id`.
+    """
+    google_api_key = google_api_key or get_google_api_key()
+    google_model_name = get_model_from_settings() # Changed from openai_model
+
     # Configuración del modelo LLM
     llm = ChatGoogleGenerativeAI(model=google_model_name, google_api_key=google_api_key, temperature=0, convert_system_message_to_human=True) # Changed LLM
 
-    redis_url = frappe.conf.get("redis_cache", "redis://localhost:6379/0")
-    message_history = RedisChatMessageHistory(session_id=session_id, url=redis_url)
-
     memory = ConversationBufferMemory(memory_key="chat_history", chat_memory=message_history)
 
     tools = [update_customers, create_customer, delete_customers, get_info_customer,
              create_sales_invoice,create_sales_order, get_sales_stats, create_purchase_invoice, create_suppliers,
-             get_item_stats,get_sales_stats,create_item,consultar_identificacion_sat]
+             get_item_stats,create_item,consultar_identificacion_sat,export_query_results]
 
-    system_message = SystemMessage(content="Eres un asistente virtual que responde exclusivamente en español. No importa el idioma en el que te hablen, siempre debes responder en español.")
+    # Solo se ofrecen las herramientas relevantes para la intención del mensaje y permitidas al usuario
+    tools = select_tools(tools, prompt_message, get_previous_human_message(message_history))
 
-    agent_chain = initialize_agent(
+    # El catálogo compacto y el prompt estático se renderizan una sola vez por conjunto de herramientas
+    tools, prompt = get_agent_configuration(tools)
+    agent = ConversationalAgent(llm_chain=LLMChain(llm=llm, prompt=prompt), allowed_tools=[t.name for t in tools])
+
+    agent_chain = AgentExecutor.from_agent_and_tools(
+        agent=agent,
         tools=tools,
-        llm=llm,
-        agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
         verbose=True,
         memory=memory,
         handle_parsing_errors = True,
-        agent_kwargs={
-            "system_message": system_message.content # Pass system message content directly if ChatGoogleGenerativeAI expects it this way
-        }
     )
 
     chat_history_str = memory.load_memory_variables({})["chat_history"]
 
-    response = agent_chain.run({"chat_history": chat_history_str, "input": prompt_message})
+    # Cuenta los tokens de todas las llamadas al LLM de este turno (pasos ReAct y reintentos)
+    usage_handler = TokenUsageCallbackHandler()
+    try:
+        response = agent_chain.run({"chat_history": chat_history_str, "input": prompt_message}, callbacks=[usage_handler, *(callbacks or [])])
+    finally:
+        record_usage(session_id, google_model_name, usage_handler)
 
     response = ensure_spanish(response)
     return response
 
+def get_google_api_key() -> str:
+    google_api_key = frappe.conf.get("google_api_key") or frappe.get_site_config().get("google_api_key")
+    # os.environ["OPENAI_API_KEY"] = openai_api_key  # Removed
+
+    if not google_api_key:
+        frappe.throw("Please set `google_api_key` in site config") # Changed from openai_api_key
+
+    return google_api_key
+
 def get_model_from_settings():
     # Changed to fetch google_model_name and default to gemma-3-27b-it
     return frappe.db.get_single_value("DoppioBot Settings", "google_model_name") or "models/gemma-3-27b-it"
@@ -551,3 +579,34 @@ def get_sales_stats(period: str) -> str:
         frappe.log_error(f"Error getting Sales stats: {str(e)}")
         return f"failed: {str(e)}"
 
+@tool
+def export_query_results(export_data: str) -> str:
+    """
+    Export a list of records (e.g. all invoices of a month, a customer list) to a downloadable file.
+    Use this instead of listing many records in the answer.
+    Expected input: JSON string with the following fields:
+    - `doctype`: The DocType to query, e.g. "Sales Invoice", "Customer" (mandatory).
+    - `fields`: (optional) List of fields of the DocType itself (no child table fields). Defaults to ["name"].
+    - `filters`: (optional) Dictionary of filters, e.g. {"customer": "ACME", "docstatus": 1}.
+    - `period`: (optional) "this_month", "last_month" or "this_year".
+    - `date_field`: (optional) Date field used by `period`. Defaults to "posting_date" or "creation".
+    - `format`: (optional) "csv" or "xlsx". Defaults to "csv".
+    Returns a JSON string with `row_count`, a short `preview` and the `file_url` to share with the user, otherwise "failed".
+    """
+    try:
+        data = frappe.parse_json(export_data)
+        if not data.get("doctype"):
+            return "failed: Missing required field 'doctype'."
+        result = export_query_to_file(
+            data["doctype"],
+            fields=data.get("fields"),
+            filters=data.get("filters"),
+            period=data.get("period"),
+            date_field=data.get("date_field"),
+            file_format=data.get("format", "csv"),
+        )
+        result["file_url"] = frappe.utils.get_url(result["file_url"])
+        return json.dumps(result, default=str)
+    except Exception as e:
+        frappe.log_error(f"Error exporting query results: {str(e)}")
+        return f"failed: {str(e)}"
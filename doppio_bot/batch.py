@@ -0,0 +1,346 @@
+import frappe
+import csv
+import json
+import time
+from frappe.utils import cint, now_datetime
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.memory import ChatMessageHistory
+from doppio_bot.api import get_google_api_key, run_agent
+from doppio_bot.files import get_file_path, write_private_file
+from doppio_bot.usage import is_token_budget_exceeded
+
+BATCH_CURSOR_KEY = "doppio_bot|batch|{job}|cursor"
+BATCH_WORKERS_KEY = "doppio_bot|batch|{job}|workers"
+LLM_CALLS_WINDOW_KEY = "doppio_bot|batch|llm_calls|{window}"
+INSTRUCTION_COLUMNS = ("instruction", "instrucción", "instruccion")
+ROWS_CHUNK_SIZE = 500
+MAX_WORKERS = 8
+DEFAULT_WORKERS = 2
+DEFAULT_LLM_CALLS_PER_MINUTE = 15
+WORKER_TIMEOUT = 6 * 60 * 60
+INTERRUPTED_ROW_RESPONSE = "failed: La ejecución de esta fila se interrumpió; revisa si la operación se realizó antes de repetirla."
+
+
+class LLMRatePacingCallbackHandler(BaseCallbackHandler):
+    """
+    Blocks before every LLM call until the shared per-minute budget of the batch workers
+    has room, so a batch never bursts past the provider's request quota.
+    """
+
+    def __init__(self, calls_per_minute: int):
+        self.calls_per_minute = calls_per_minute
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        wait_for_llm_call_slot(self.calls_per_minute)
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        wait_for_llm_call_slot(self.calls_per_minute)
+
+
+def wait_for_llm_call_slot(calls_per_minute: int):
+    if not calls_per_minute:
+        return
+
+    cache = frappe.cache()
+    while True:
+        window = int(time.time() // 60)
+        key = cache.make_key(LLM_CALLS_WINDOW_KEY.format(window=window))
+        calls, _ = cache.pipeline().incr(key).expire(key, 120).execute()
+        if calls <= calls_per_minute:
+            return
+        # Espera al inicio de la siguiente ventana de un minuto
+        time.sleep(60 - time.time() % 60)
+
+
+def get_batch_settings() -> frappe._dict:
+    settings = frappe.get_cached_doc("DoppioBot Settings")
+    workers = cint(settings.get("batch_worker_count")) or DEFAULT_WORKERS
+    return frappe._dict(
+        workers=min(max(workers, 1), MAX_WORKERS),
+        llm_calls_per_minute=cint(settings.get("batch_llm_calls_per_minute")) or DEFAULT_LLM_CALLS_PER_MINUTE,
+    )
+
+
+def get_batch_key(key: str, batch_job: str) -> str:
+    return frappe.cache().make_key(key.format(job=batch_job))
+
+
+def get_running_workers(batch_job: str) -> int:
+    return cint(frappe.cache().pipeline().get(get_batch_key(BATCH_WORKERS_KEY, batch_job)).execute()[0])
+
+
+@frappe.whitelist()
+def start_batch_job(batch_job: str):
+    """
+    Starts a batch job, or resumes a paused/failed one from its last checkpoint.
+    """
+    job = frappe.get_doc("DoppioBot Batch Job", batch_job)
+    job.check_permission("write")
+    if job.status in ("Queued", "Running"):
+        frappe.throw(f"El lote {batch_job} ya está en ejecución.")
+    if job.status == "Completed":
+        frappe.throw(f"El lote {batch_job} ya fue completado.")
+    if get_running_workers(batch_job) > 0:
+        frappe.throw(f"El lote {batch_job} todavía está terminando las filas en curso. Intenta de nuevo en unos minutos.")
+
+    job.db_set("status", "Queued")
+    frappe.enqueue(
+        "doppio_bot.batch.prepare_batch_job",
+        queue="long",
+        batch_job=batch_job,
+        enqueue_after_commit=True,
+    )
+
+
+@frappe.whitelist()
+def pause_batch_job(batch_job: str):
+    job = frappe.get_doc("DoppioBot Batch Job", batch_job)
+    job.check_permission("write")
+    if job.status in ("Queued", "Running"):
+        # Los workers revisan el estado antes de cada fila y se detienen solos
+        job.db_set("status", "Paused")
+
+
+def prepare_batch_job(batch_job: str):
+    """
+    Splits the input file into `DoppioBot Batch Job Row` checkpoints (once per job)
+    and starts the worker pool at the first pending row.
+    """
+    job = frappe.get_doc("DoppioBot Batch Job", batch_job)
+    try:
+        if not job.total_rows:
+            job.db_set("total_rows", load_batch_rows(job), commit=True)
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Error reading batch file {batch_job}: {str(e)}")
+        job.db_set("status", "Failed", commit=True)
+        publish_batch_progress(batch_job)
+        return
+
+    # Filas que quedaron a medias en una ejecución anterior: pudieron haber creado documentos,
+    # así que no se repiten y quedan marcadas para revisión
+    frappe.db.sql("""UPDATE `tabDoppioBot Batch Job Row`
+                     SET status = 'Failed', response = %s
+                     WHERE batch_job = %s AND status = 'Processing'""", (INTERRUPTED_ROW_RESPONSE, batch_job))
+    interrupted_rows = frappe.db._cursor.rowcount
+    if interrupted_rows:
+        frappe.db.sql("""UPDATE `tabDoppioBot Batch Job`
+                         SET processed_rows = processed_rows + %s,
+                             failed_rows = failed_rows + %s
+                         WHERE name = %s""", (interrupted_rows, interrupted_rows, batch_job))
+    frappe.db.commit()
+
+    first_pending = frappe.db.sql("""SELECT MIN(row_number)
+                                     FROM `tabDoppioBot Batch Job Row`
+                                     WHERE batch_job = %s AND status = 'Pending'""", batch_job)[0][0]
+    if not first_pending:
+        finalize_batch_job(batch_job)
+        return
+
+    # Si el lote se pausó mientras estaba en cola, no se inicia
+    frappe.db.sql("""UPDATE `tabDoppioBot Batch Job`
+                     SET status = 'Running'
+                     WHERE name = %s AND status = 'Queued'""", batch_job)
+    started = frappe.db._cursor.rowcount == 1
+    frappe.db.commit()
+    if not started:
+        publish_batch_progress(batch_job)
+        return
+
+    settings = get_batch_settings()
+    cache = frappe.cache()
+    workers_key = get_batch_key(BATCH_WORKERS_KEY, batch_job)
+    # El contador expira con el timeout de los workers, por si alguno muere sin descontarse
+    cache.pipeline().set(
+        get_batch_key(BATCH_CURSOR_KEY, batch_job), cint(first_pending) - 1
+    ).set(workers_key, settings.workers, ex=WORKER_TIMEOUT).execute()
+
+    for worker in range(settings.workers):
+        frappe.enqueue(
+            "doppio_bot.batch.process_batch_rows",
+            queue="long",
+            timeout=WORKER_TIMEOUT,
+            batch_job=batch_job,
+            worker=worker,
+        )
+    publish_batch_progress(batch_job)
+
+
+def load_batch_rows(job) -> int:
+    """
+    Streams the CSV/JSONL input into pending rows, inserting them in chunks.
+    Returns the number of rows.
+    """
+    row_count = 0
+    chunk = []
+    now = now_datetime()
+    for instruction in read_instructions(get_file_path(job.input_file)):
+        row_count += 1
+        chunk.append((
+            f"{job.name}-{row_count:06d}", job.name, row_count, instruction, "Pending",
+            now, now, frappe.session.user, frappe.session.user,
+        ))
+        if len(chunk) >= ROWS_CHUNK_SIZE:
+            insert_batch_rows(chunk)
+            chunk = []
+
+    if chunk:
+        insert_batch_rows(chunk)
+    return row_count
+
+
+def insert_batch_rows(rows: list):
+    frappe.db.bulk_insert(
+        "DoppioBot Batch Job Row",
+        fields=["name", "batch_job", "row_number", "instruction", "status", "creation", "modified", "owner", "modified_by"],
+        values=rows,
+    )
+
+
+def read_instructions(path: str):
+    """
+    Yields the instructions of a CSV (first row is the header; uses the `instruction`
+    column or else the first one) or JSONL file (a string or an object with `instruction`
+    per line). Empty rows are skipped.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith(".jsonl"):
+            for line in f:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                instruction = data.get("instruction") if isinstance(data, dict) else data
+                if instruction and str(instruction).strip():
+                    yield str(instruction).strip()
+            return
+
+        reader = csv.reader(f)
+        header = [column.strip().lower() for column in next(reader, [])]
+        column = next((header.index(c) for c in INSTRUCTION_COLUMNS if c in header), 0)
+        for row in reader:
+            if len(row) > column and row[column].strip():
+                yield row[column].strip()
+
+
+def process_batch_rows(batch_job: str, worker: int):
+    """
+    Worker loop: claims the next row through a shared Redis cursor until the file is
+    exhausted, the job is paused or the token budget runs out. The last worker to
+    finish writes the results file.
+    """
+    cache = frappe.cache()
+    cursor_key = get_batch_key(BATCH_CURSOR_KEY, batch_job)
+    workers_key = get_batch_key(BATCH_WORKERS_KEY, batch_job)
+    pacing_handler = LLMRatePacingCallbackHandler(get_batch_settings().llm_calls_per_minute)
+
+    try:
+        google_api_key = get_google_api_key()
+        total_rows = cint(frappe.db.get_value("DoppioBot Batch Job", batch_job, "total_rows"))
+        while frappe.db.get_value("DoppioBot Batch Job", batch_job, "status") == "Running":
+            if is_token_budget_exceeded():
+                frappe.db.set_value("DoppioBot Batch Job", batch_job, "status", "Paused")
+                frappe.db.commit()
+                break
+
+            row_number = cache.pipeline().incr(cursor_key).expire(workers_key, WORKER_TIMEOUT).execute()[0]
+            if row_number > total_rows:
+                break
+
+            row = frappe.db.get_value(
+                "DoppioBot Batch Job Row",
+                {"batch_job": batch_job, "row_number": row_number, "status": "Pending"},
+                ["name", "instruction"],
+                as_dict=True,
+            )
+            if row and claim_batch_row(row.name):
+                process_batch_row(batch_job, row, google_api_key, pacing_handler)
+    finally:
+        remaining = cache.pipeline().decr(workers_key).execute()[0]
+        if remaining <= 0:
+            finalize_batch_job(batch_job)
+
+
+def claim_batch_row(row_name: str) -> bool:
+    """
+    Atomically moves a row from Pending to Processing. Only the worker that changed
+    the row may run it, so an instruction is never executed twice.
+    """
+    frappe.db.sql("""UPDATE `tabDoppioBot Batch Job Row`
+                     SET status = 'Processing'
+                     WHERE name = %s AND status = 'Pending'""", row_name)
+    claimed = frappe.db._cursor.rowcount == 1
+    frappe.db.commit()
+    return claimed
+
+
+def process_batch_row(batch_job: str, row, google_api_key: str, pacing_handler: LLMRatePacingCallbackHandler):
+    try:
+        # Cada fila es independiente: memoria vacía y el uso de tokens se agrupa bajo el lote
+        response = run_agent(batch_job, row.instruction, ChatMessageHistory(), google_api_key=google_api_key, callbacks=[pacing_handler])
+        status = "Done"
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Error processing batch row {row.name}: {str(e)}")
+        response, status = f"failed: {str(e)}", "Failed"
+
+    frappe.db.set_value("DoppioBot Batch Job Row", row.name, {"status": status, "response": response}, update_modified=False)
+    frappe.db.sql("""UPDATE `tabDoppioBot Batch Job`
+                     SET processed_rows = processed_rows + 1,
+                         failed_rows = failed_rows + %s
+                     WHERE name = %s""", (cint(status == "Failed"), batch_job))
+    frappe.db.commit()
+    publish_batch_progress(batch_job)
+
+
+def finalize_batch_job(batch_job: str):
+    """
+    Writes the results file once every row has been processed. Jobs with rows left
+    (paused, or a worker died mid-row) stay resumable instead; rows left in Processing
+    are marked for review when the job is resumed.
+    """
+    frappe.cache().pipeline().delete(
+        get_batch_key(BATCH_CURSOR_KEY, batch_job), get_batch_key(BATCH_WORKERS_KEY, batch_job)
+    ).execute()
+
+    job = frappe.get_doc("DoppioBot Batch Job", batch_job)
+    if frappe.db.exists("DoppioBot Batch Job Row", {"batch_job": batch_job, "status": ("in", ["Pending", "Processing"])}):
+        if job.status == "Running":
+            job.db_set("status", "Paused", commit=True)
+        publish_batch_progress(batch_job)
+        return
+
+    with write_private_file(f"{batch_job}-resultados.csv", "DoppioBot Batch Job", batch_job) as output:
+        writer = csv.writer(output.file)
+        writer.writerow(["row_number", "instruction", "status", "response"])
+        start = 0
+        while True:
+            rows = frappe.get_all(
+                "DoppioBot Batch Job Row",
+                filters={"batch_job": batch_job},
+                fields=["row_number", "instruction", "status", "response"],
+                order_by="row_number asc",
+                limit_start=start,
+                limit_page_length=ROWS_CHUNK_SIZE,
+                as_list=True,
+            )
+            writer.writerows(rows)
+            if len(rows) < ROWS_CHUNK_SIZE:
+                break
+            start += ROWS_CHUNK_SIZE
+
+    job.db_set({"status": "Completed", "result_file": output.file_doc.file_url}, commit=True)
+    publish_batch_progress(batch_job)
+
+
+def publish_batch_progress(batch_job: str):
+    progress = frappe.db.get_value(
+        "DoppioBot Batch Job", batch_job,
+        ["status", "total_rows", "processed_rows", "failed_rows", "result_file"],
+        as_dict=True,
+    )
+    frappe.publish_realtime(
+        "doppio_bot_batch_progress",
+        dict(progress, name=batch_job),
+        doctype="DoppioBot Batch Job",
+        docname=batch_job,
+    )
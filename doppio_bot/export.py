@@ -0,0 +1,122 @@
+import frappe
+import csv
+from datetime import date, timedelta
+from typing import Optional
+from frappe.model import default_fields, table_fields
+from openpyxl import Workbook
+from doppio_bot.files import write_private_file
+
+EXPORT_CHUNK_SIZE = 500
+PREVIEW_ROWS = 5
+EXPORT_FORMATS = ("csv", "xlsx")
+
+
+def get_period_filter(date_field: str, period: str) -> list:
+    today = date.today()
+    if period == "this_month":
+        start_date, end_date = today.replace(day=1), today
+    elif period == "last_month":
+        end_date = today.replace(day=1) - timedelta(days=1)
+        start_date = end_date.replace(day=1)
+    elif period == "this_year":
+        start_date, end_date = today.replace(month=1, day=1), today
+    else:
+        frappe.throw(f"Periodo inválido: {period}. Usa 'this_month', 'last_month' o 'this_year'.")
+    return [date_field, "between", [start_date, end_date]]
+
+
+def normalize_filters(filters) -> list:
+    """
+    Accepts `{"field": value}` / `{"field": [operator, value]}` dicts or `[field, operator, value]` lists.
+    """
+    if isinstance(filters, dict):
+        return [
+            [field, *value] if isinstance(value, (list, tuple)) else [field, "=", value]
+            for field, value in filters.items()
+        ]
+    return [list(condition) for condition in filters or []]
+
+
+def validate_export_fields(doctype: str, fields: list):
+    """
+    Only plain fields of `doctype` can be exported: child-table columns return one row
+    per child, which the paging on `name` in `iter_query_chunks` would cut short.
+    """
+    meta = frappe.get_meta(doctype)
+    for field in fields:
+        df = meta.get_field(field)
+        if field not in default_fields and (not df or df.fieldtype in table_fields):
+            frappe.throw(f"Campo inválido para exportar: {field}. Usa solo campos de {doctype}, sin tablas hijas.")
+
+
+def iter_query_chunks(doctype: str, fields: list, filters: list):
+    """
+    Yields the matching rows (as lists, in `fields` order) in chunks, paging on `name`
+    so neither the query nor the process ever holds the whole result set. Uses
+    `frappe.get_list`, so the user's permissions apply.
+    """
+    last_name = None
+    while True:
+        page_filters = filters + ([["name", ">", last_name]] if last_name else [])
+        rows = frappe.get_list(
+            doctype,
+            fields=fields + ["name as _export_cursor"],
+            filters=page_filters,
+            order_by="name asc",
+            limit_page_length=EXPORT_CHUNK_SIZE,
+            as_list=True,
+        )
+        if not rows:
+            return
+        last_name = rows[-1][-1]
+        yield [list(row[:-1]) for row in rows]
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+
+
+def export_query_to_file(doctype: str, fields: Optional[list] = None, filters=None, period: Optional[str] = None,
+                         date_field: Optional[str] = None, file_format: str = "csv") -> dict:
+    """
+    Runs a `doctype` query server-side and streams its rows into a private CSV/XLSX `File`.
+    Returns the row count, a short preview and the download URL.
+    """
+    file_format = (file_format or "csv").lower()
+    if file_format not in EXPORT_FORMATS:
+        frappe.throw(f"Formato inválido: {file_format}. Usa 'csv' o 'xlsx'.")
+
+    fields = fields or ["name"]
+    validate_export_fields(doctype, fields)
+    filters = normalize_filters(filters)
+    if period:
+        meta = frappe.get_meta(doctype)
+        date_field = date_field or ("posting_date" if meta.has_field("posting_date") else "creation")
+        filters.append(get_period_filter(date_field, period))
+
+    row_count = 0
+    preview = []
+    file_name = f"{frappe.scrub(doctype)}.{file_format}"
+    with write_private_file(file_name, mode="wb" if file_format == "xlsx" else "w") as output:
+        if file_format == "xlsx":
+            # En modo write_only openpyxl vuelca cada fila a disco en lugar de mantener la hoja en memoria
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet(doctype[:31])
+            append_row = sheet.append
+        else:
+            append_row = csv.writer(output.file).writerow
+
+        append_row(fields)
+        for chunk in iter_query_chunks(doctype, fields, filters):
+            for row in chunk:
+                append_row(row)
+            row_count += len(chunk)
+            if len(preview) < PREVIEW_ROWS:
+                preview.extend(dict(zip(fields, row)) for row in chunk[:PREVIEW_ROWS - len(preview)])
+
+        if file_format == "xlsx":
+            workbook.save(output.file)
+
+    return {
+        "row_count": row_count,
+        "preview": preview,
+        "file_url": output.file_doc.file_url,
+    }
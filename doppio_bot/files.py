@@ -0,0 +1,40 @@
+import frappe
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+
+@contextmanager
+def write_private_file(file_name: str, attached_to_doctype: Optional[str] = None, attached_to_name: Optional[str] = None, mode: str = "w"):
+    """
+    Opens a new file in the site's private files folder so generated files can be written
+    incrementally instead of being held in memory. Yields a dict with the open `file` and its
+    `path`; on exit the `File` document is created and stored in its `file_doc` key.
+    """
+    base_name, extension = os.path.splitext(file_name)
+    unique_name = f"{frappe.scrub(base_name)}-{frappe.generate_hash(length=8)}{extension}"
+    path = frappe.get_site_path("private", "files", unique_name)
+
+    result = frappe._dict(path=path, file_doc=None)
+    try:
+        with open(path, mode, **({} if "b" in mode else {"newline": "", "encoding": "utf-8"})) as f:
+            result.file = f
+            yield result
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    result.file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": unique_name,
+        "file_url": f"/private/files/{unique_name}",
+        "is_private": 1,
+        "file_size": os.path.getsize(path),
+        "attached_to_doctype": attached_to_doctype,
+        "attached_to_name": attached_to_name,
+    }).insert(ignore_permissions=True)
+
+
+def get_file_path(file_url: str) -> str:
+    return frappe.get_doc("File", {"file_url": file_url}).get_full_path()
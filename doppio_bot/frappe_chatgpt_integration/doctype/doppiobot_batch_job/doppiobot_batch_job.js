@@ -0,0 +1,52 @@
+// Copyright (c) 2026, Hussain Nagaria and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("DoppioBot Batch Job", {
+	setup(frm) {
+		frappe.realtime.on("doppio_bot_batch_progress", (progress) => {
+			if (progress.name !== frm.doc.name) return;
+
+			frm.events.show_progress(frm, progress);
+			if (progress.status !== frm.doc.status) {
+				frm.reload_doc();
+			}
+		});
+	},
+
+	refresh(frm) {
+		if (frm.is_new()) return;
+
+		if (["Pending", "Paused", "Failed"].includes(frm.doc.status)) {
+			const label = frm.doc.status === "Pending" ? __("Start") : __("Resume");
+			frm.add_custom_button(label, () => {
+				frappe
+					.call("doppio_bot.batch.start_batch_job", { batch_job: frm.doc.name })
+					.then(() => frm.reload_doc());
+			});
+		}
+
+		if (["Queued", "Running"].includes(frm.doc.status)) {
+			frm.add_custom_button(__("Pause"), () => {
+				frappe
+					.call("doppio_bot.batch.pause_batch_job", { batch_job: frm.doc.name })
+					.then(() => frm.reload_doc());
+			});
+		}
+
+		frm.events.show_progress(frm, frm.doc);
+	},
+
+	show_progress(frm, progress) {
+		if (!progress.total_rows) return;
+
+		frm.dashboard.show_progress(
+			__("Progress"),
+			(progress.processed_rows / progress.total_rows) * 100,
+			__("{0} of {1} rows processed, {2} failed", [
+				progress.processed_rows,
+				progress.total_rows,
+				progress.failed_rows,
+			])
+		);
+	},
+});
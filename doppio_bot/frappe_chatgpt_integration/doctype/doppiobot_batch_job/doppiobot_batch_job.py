@@ -0,0 +1,17 @@
+# Copyright (c) 2026, Hussain Nagaria and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class DoppioBotBatchJob(Document):
+	def validate(self):
+		if not self.input_file.lower().endswith((".csv", ".jsonl")):
+			frappe.throw("El archivo de entrada debe ser CSV o JSONL.")
+
+		if not self.is_new() and self.total_rows and self.has_value_changed("input_file"):
+			frappe.throw("No se puede cambiar el archivo de un lote que ya fue procesado.")
+
+	def on_trash(self):
+		frappe.db.delete("DoppioBot Batch Job Row", {"batch_job": self.name})
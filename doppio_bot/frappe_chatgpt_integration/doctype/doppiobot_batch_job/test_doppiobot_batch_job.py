@@ -0,0 +1,25 @@
+# Copyright (c) 2026, Hussain Nagaria and Contributors
+# See license.txt
+
+import os
+import tempfile
+
+from frappe.tests.utils import FrappeTestCase
+
+from doppio_bot.batch import read_instructions
+
+
+class TestDoppioBotBatchJob(FrappeTestCase):
+	def read(self, suffix, content):
+		with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8") as f:
+			f.write(content)
+		self.addCleanup(os.remove, f.name)
+		return list(read_instructions(f.name))
+
+	def test_read_csv_instruction_column(self):
+		content = "cliente,instruccion\nACME,crear cliente ACME\nFoo,\nBar,factura para Bar\n"
+		self.assertEqual(self.read(".csv", content), ["crear cliente ACME", "factura para Bar"])
+
+	def test_read_jsonl(self):
+		content = '"consultar NIT 123456789"\n\n{"instruction": "crear cliente ACME"}\n'
+		self.assertEqual(self.read(".jsonl", content), ["consultar NIT 123456789", "crear cliente ACME"])
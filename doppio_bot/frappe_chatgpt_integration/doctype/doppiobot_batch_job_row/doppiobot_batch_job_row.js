@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Hussain Nagaria and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("DoppioBot Batch Job Row", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,50 @@
+# Copyright (c) 2026, Hussain Nagaria and Contributors
+# See license.txt
+
+import time
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from doppio_bot.history import (
+	EVICT_IDLE_SESSION_SCRIPT,
+	SESSION_ACTIVITY_KEY,
+	SESSION_OWNER_KEY,
+	compress_messages,
+	decompress_messages,
+	get_chat_message_history,
+	mark_session_active,
+)
+
+
+class TestDoppioBotChatArchive(FrappeTestCase):
+	def test_compressed_messages_round_trip(self):
+		messages = [
+			{"type": "human", "data": {"content": "hola"}},
+			{"type": "ai", "data": {"content": "¿En qué puedo ayudarte?"}},
+		]
+		self.assertEqual(decompress_messages(compress_messages(messages)), messages)
+		self.assertEqual(decompress_messages(None), [])
+
+	def test_active_session_is_not_evicted(self):
+		cache = frappe.cache()
+		activity_key = cache.make_key(SESSION_ACTIVITY_KEY)
+		owner_key = cache.make_key(SESSION_OWNER_KEY)
+		history = get_chat_message_history("test-archive-session")
+		history.add_user_message("hola")
+		cutoff = time.time() - 60
+
+		try:
+			# La sesión se reactivó después de que el job la eligiera para archivar
+			mark_session_active("test-archive-session", "Administrator")
+			args = (3, history.key, activity_key, owner_key, "test-archive-session", cutoff)
+			self.assertEqual(history.redis_client.eval(EVICT_IDLE_SESSION_SCRIPT, *args), 0)
+			self.assertEqual(len(history.messages), 1)
+
+			cache.pipeline().zadd(activity_key, {"test-archive-session": cutoff - 60}).execute()
+			self.assertEqual(history.redis_client.eval(EVICT_IDLE_SESSION_SCRIPT, *args), 1)
+			self.assertEqual(history.messages, [])
+			self.assertIsNone(cache.pipeline().zscore(activity_key, "test-archive-session").execute()[0])
+		finally:
+			history.clear()
+			cache.pipeline().zrem(activity_key, "test-archive-session").hdel(owner_key, "test-archive-session").execute()
@@ -0,0 +1,39 @@
+# Copyright (c) 2026, Hussain Nagaria and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from doppio_bot.usage import TokenUsageCallbackHandler, flush_token_usage, get_daily_total_key, record_usage
+
+
+class TestDoppioBotTokenUsage(FrappeTestCase):
+	def setUp(self):
+		# flush_token_usage commits, so rows from earlier runs survive the test rollback
+		frappe.db.delete("DoppioBot Token Usage", {"session_id": "test-usage-session"})
+		frappe.db.commit()
+
+	def tearDown(self):
+		frappe.db.delete("DoppioBot Token Usage", {"session_id": "test-usage-session"})
+		frappe.db.commit()
+		# record_usage también suma a los totales diarios de Redis, que no se revierten con la transacción
+		frappe.cache().pipeline().delete(
+			get_daily_total_key("site"), get_daily_total_key("user:Administrator")
+		).execute()
+
+	def test_flush_aggregates_buffered_usage(self):
+		handler = TokenUsageCallbackHandler()
+		handler.llm_calls, handler.prompt_tokens, handler.completion_tokens = 2, 100, 20
+
+		record_usage("test-usage-session", "test-model", handler, user="Administrator")
+		record_usage("test-usage-session", "test-model", handler, user="Administrator")
+		flush_token_usage()
+
+		usage = frappe.get_all(
+			"DoppioBot Token Usage",
+			filters={"session_id": "test-usage-session"},
+			fields=["llm_calls", "prompt_tokens", "completion_tokens", "total_tokens"],
+		)
+		self.assertEqual(len(usage), 1)
+		self.assertEqual(usage[0].llm_calls, 4)
+		self.assertEqual(usage[0].total_tokens, 240)
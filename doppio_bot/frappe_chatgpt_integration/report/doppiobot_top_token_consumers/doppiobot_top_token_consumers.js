@@ -0,0 +1,35 @@
+// Copyright (c) 2026, Hussain Nagaria and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["DoppioBot Top Token Consumers"] = {
+	filters: [
+		{
+			fieldname: "from_date",
+			label: __("From Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.add_days(frappe.datetime.get_today(), -30),
+			reqd: 1,
+		},
+		{
+			fieldname: "to_date",
+			label: __("To Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.get_today(),
+			reqd: 1,
+		},
+		{
+			fieldname: "group_by",
+			label: __("Group By"),
+			fieldtype: "Select",
+			options: "User\nSession\nModel\nDay",
+			default: "User",
+			reqd: 1,
+		},
+		{
+			fieldname: "limit",
+			label: __("Top"),
+			fieldtype: "Int",
+			default: 20,
+		},
+	],
+};
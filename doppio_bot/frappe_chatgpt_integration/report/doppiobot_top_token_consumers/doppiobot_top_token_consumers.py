@@ -0,0 +1,53 @@
+# Copyright (c) 2026, Hussain Nagaria and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+GROUP_BY_COLUMNS = {
+	"User": {"fieldname": "user", "label": _("User"), "fieldtype": "Link", "options": "User", "width": 220},
+	"Session": {"fieldname": "session_id", "label": _("Session ID"), "fieldtype": "Data", "width": 220},
+	"Model": {"fieldname": "model", "label": _("Model"), "fieldtype": "Data", "width": 220},
+	"Day": {"fieldname": "date", "label": _("Date"), "fieldtype": "Date", "width": 120},
+}
+
+
+def execute(filters=None):
+	filters = frappe._dict(filters or {})
+	group_by_column = GROUP_BY_COLUMNS[filters.get("group_by") or "User"]
+	return get_columns(group_by_column), get_data(filters, group_by_column["fieldname"])
+
+
+def get_columns(group_by_column):
+	return [
+		group_by_column,
+		{"fieldname": "llm_calls", "label": _("LLM Calls"), "fieldtype": "Int", "width": 110},
+		{"fieldname": "prompt_tokens", "label": _("Prompt Tokens"), "fieldtype": "Int", "width": 140},
+		{"fieldname": "completion_tokens", "label": _("Completion Tokens"), "fieldtype": "Int", "width": 160},
+		{"fieldname": "total_tokens", "label": _("Total Tokens"), "fieldtype": "Int", "width": 140},
+		{"fieldname": "tokens_per_call", "label": _("Tokens per Call"), "fieldtype": "Int", "width": 140},
+	]
+
+
+def get_data(filters, group_by):
+	# group_by siempre proviene de GROUP_BY_COLUMNS, nunca del usuario
+	return frappe.db.sql(
+		f"""SELECT `{group_by}`,
+		           SUM(llm_calls) AS llm_calls,
+		           SUM(prompt_tokens) AS prompt_tokens,
+		           SUM(completion_tokens) AS completion_tokens,
+		           SUM(total_tokens) AS total_tokens,
+		           SUM(total_tokens) / NULLIF(SUM(llm_calls), 0) AS tokens_per_call
+		    FROM `tabDoppioBot Token Usage`
+		    WHERE date BETWEEN %(from_date)s AND %(to_date)s
+		    GROUP BY `{group_by}`
+		    ORDER BY total_tokens DESC
+		    LIMIT %(limit)s""",
+		{
+			"from_date": filters.from_date,
+			"to_date": filters.to_date,
+			"limit": cint(filters.limit) or 20,
+		},
+		as_dict=True,
+	)
@@ -0,0 +1,199 @@
+import frappe
+import json
+import time
+import zlib
+import base64
+from typing import Optional
+from datetime import datetime
+from frappe.utils import cint, now_datetime
+from langchain.memory import RedisChatMessageHistory
+from langchain.schema import messages_from_dict, messages_to_dict
+
+# Registro de sesiones activas: sorted set por última actividad y hash con el dueño de cada sesión
+SESSION_ACTIVITY_KEY = "doppio_bot|chat_sessions|last_active"
+SESSION_OWNER_KEY = "doppio_bot|chat_sessions|owner"
+DEFAULT_IDLE_HOURS = 24
+MAX_PAGE_LENGTH = 100
+
+# Borra la sesión solo si sigue inactiva; se ejecuta en Redis de forma atómica para que
+# un turno que llegue durante el archivado no pierda sus mensajes
+EVICT_IDLE_SESSION_SCRIPT = """
+local last_active = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if last_active and tonumber(last_active) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+return 1
+"""
+
+
+def get_chat_message_history(session_id: str) -> RedisChatMessageHistory:
+    """
+    Returns the Redis backed message store of a session. The Redis key expires a day
+    after the archival threshold, so abandoned sessions never outlive a missed scheduler run.
+    """
+    redis_url = frappe.conf.get("redis_cache", "redis://localhost:6379/0")
+    ttl = (get_idle_hours() + 24) * 60 * 60
+    return RedisChatMessageHistory(session_id=session_id, url=redis_url, ttl=ttl)
+
+
+def get_idle_hours() -> int:
+    return cint(frappe.db.get_single_value("DoppioBot Settings", "chat_session_idle_hours")) or DEFAULT_IDLE_HOURS
+
+
+def touch_session(session_id: str, user: Optional[str] = None):
+    """
+    Marks a session as active, then restores it from the archive if it was evicted.
+    Marking it first makes a concurrent `archive_idle_sessions` keep the Redis copy.
+    """
+    user = user or frappe.session.user
+    check_session_owner(session_id, user)
+    mark_session_active(session_id, user)
+    restore_session(session_id)
+
+
+def mark_session_active(session_id: str, user: Optional[str]):
+    cache = frappe.cache()
+    pipeline = cache.pipeline().zadd(cache.make_key(SESSION_ACTIVITY_KEY), {session_id: time.time()})
+    if user:
+        pipeline.hsetnx(cache.make_key(SESSION_OWNER_KEY), session_id, user)
+    pipeline.execute()
+
+
+def get_session_owner(session_id: str) -> Optional[str]:
+    cache = frappe.cache()
+    owner = cache.pipeline().hget(cache.make_key(SESSION_OWNER_KEY), session_id).execute()[0]
+    if owner:
+        return frappe.safe_decode(owner)
+    return frappe.db.get_value("DoppioBot Chat Archive", session_id, "user")
+
+
+def check_session_owner(session_id: str, user: Optional[str] = None):
+    owner = get_session_owner(session_id)
+    if owner and owner != (user or frappe.session.user):
+        frappe.throw("No tienes permiso para acceder a esta conversación.", frappe.PermissionError)
+
+
+@frappe.whitelist()
+def get_chat_history(session_id: str, before: Optional[int] = None, page_length: int = 20) -> dict:
+    """
+    Returns up to `page_length` messages older than the chronological index `before`
+    (the latest page when omitted), in chronological order. Indices are stable while
+    the session grows, so the UI can keep paging backwards with `first_index`.
+    """
+    check_session_owner(session_id)
+    restore_session(session_id)
+
+    page_length = min(max(cint(page_length), 1), MAX_PAGE_LENGTH)
+    history = get_chat_message_history(session_id)
+
+    total = history.redis_client.llen(history.key)
+    # frappe.call envía los argumentos nulos como cadena vacía
+    end = total if before in (None, "") else min(max(cint(before), 0), total)
+    first_index = max(end - page_length, 0)
+
+    # La lista en Redis guarda el mensaje más reciente en el índice 0
+    raw_messages = []
+    if end > first_index:
+        raw_messages = history.redis_client.lrange(history.key, total - end, total - first_index - 1)
+    messages = messages_from_dict([json.loads(m) for m in reversed(raw_messages)])
+
+    return {
+        "messages": [
+            {"from": "human" if message.type == "human" else "ai", "content": message.content}
+            for message in messages
+        ],
+        "first_index": first_index,
+        "total": total,
+        "has_more": first_index > 0,
+    }
+
+
+def restore_session(session_id: str) -> bool:
+    """
+    Moves an archived session back into Redis. Returns True if it was restored.
+    The archive is only deleted once its messages are back in Redis; while the Redis
+    list still exists (the archival job has not cleared it yet) the archive is kept.
+    """
+    if not frappe.db.exists("DoppioBot Chat Archive", session_id):
+        return False
+
+    # Antes de revisar Redis, para que un archivado en curso no borre la sesión después
+    mark_session_active(session_id, frappe.db.get_value("DoppioBot Chat Archive", session_id, "user"))
+    history = get_chat_message_history(session_id)
+    if history.redis_client.exists(history.key):
+        return False
+
+    archive = frappe.get_doc("DoppioBot Chat Archive", session_id)
+    messages = decompress_messages(archive.compressed_messages)
+    if messages:
+        # LPUSH deja el último mensaje en la cabeza, igual que RedisChatMessageHistory
+        history.redis_client.pipeline().lpush(
+            history.key, *[json.dumps(message) for message in messages]
+        ).expire(history.key, history.ttl).execute()
+
+    frappe.delete_doc("DoppioBot Chat Archive", session_id, ignore_permissions=True)
+    frappe.db.commit()
+    return True
+
+
+def archive_idle_sessions():
+    """
+    Scheduled job: archives sessions idle for longer than the configured threshold
+    into `DoppioBot Chat Archive` and frees their Redis keys.
+    """
+    cache = frappe.cache()
+    activity_key = cache.make_key(SESSION_ACTIVITY_KEY)
+    owner_key = cache.make_key(SESSION_OWNER_KEY)
+    cutoff = time.time() - get_idle_hours() * 60 * 60
+
+    idle_sessions = cache.pipeline().zrangebyscore(activity_key, 0, cutoff, withscores=True).execute()[0]
+    for session_id, _ in idle_sessions:
+        session_id = frappe.safe_decode(session_id)
+        last_active, owner = cache.pipeline().zscore(activity_key, session_id).hget(owner_key, session_id).execute()
+        # La sesión pudo reactivarse mientras se archivaban las anteriores
+        if last_active is None or last_active > cutoff:
+            continue
+
+        history = get_chat_message_history(session_id)
+
+        messages = messages_to_dict(history.messages)
+        if messages:
+            archive_session(session_id, frappe.safe_decode(owner) if owner else None, messages, last_active)
+            frappe.db.commit()
+
+        evicted = history.redis_client.eval(
+            EVICT_IDLE_SESSION_SCRIPT, 3, history.key, activity_key, owner_key, session_id, cutoff
+        )
+        # Si un turno llegó mientras se archivaba, Redis tiene la versión más reciente:
+        # se descarta el archivo en lugar de borrar la sesión activa
+        if not evicted and messages:
+            frappe.delete_doc("DoppioBot Chat Archive", session_id, ignore_permissions=True)
+            frappe.db.commit()
+
+
+def archive_session(session_id: str, user: Optional[str], messages: list, last_active: float):
+    values = {
+        "user": user,
+        "message_count": len(messages),
+        "last_active": datetime.fromtimestamp(last_active),
+        "archived_on": now_datetime(),
+        "compressed_messages": compress_messages(messages),
+    }
+    if frappe.db.exists("DoppioBot Chat Archive", session_id):
+        frappe.db.set_value("DoppioBot Chat Archive", session_id, values)
+        return
+
+    frappe.get_doc(dict(values, doctype="DoppioBot Chat Archive", session_id=session_id)).insert(ignore_permissions=True)
+
+
+def compress_messages(messages: list) -> str:
+    return base64.b64encode(zlib.compress(json.dumps(messages).encode(), 9)).decode()
+
+
+def decompress_messages(compressed_messages: Optional[str]) -> list:
+    if not compressed_messages:
+        return []
+    return json.loads(zlib.decompress(base64.b64decode(compressed_messages)))
@@ -113,23 +113,14 @@ app_include_js = "/assets/doppio_bot/js/app_customizations.js"
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# 	"all": [
-# 		"doppio_bot.tasks.all"
-# 	],
-# 	"daily": [
-# 		"doppio_bot.tasks.daily"
-# 	],
-# 	"hourly": [
-# 		"doppio_bot.tasks.hourly"
-# 	],
-# 	"weekly": [
-# 		"doppio_bot.tasks.weekly"
-# 	],
-# 	"monthly": [
-# 		"doppio_bot.tasks.monthly"
-# 	],
-# }
+scheduler_events = {
+	"all": [
+		"doppio_bot.usage.flush_token_usage"
+	],
+	"hourly": [
+		"doppio_bot.history.archive_idle_sessions"
+	],
+}
 
 # Testing
 # -------
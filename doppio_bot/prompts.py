@@ -0,0 +1,116 @@
+import re
+from typing import Optional
+from langchain.agents import ConversationalAgent
+
+# Parte estática del prompt: va primero y no cambia entre llamadas, así el proveedor puede
+# reutilizarla con su caché de prefijos; el historial, la pregunta y el scratchpad van al final.
+PROMPT_PREFIX = """Eres un asistente virtual de ERPNext que responde exclusivamente en español. No importa el idioma en el que te hablen, siempre debes responder en español.
+Tu tarea es ayudar al usuario de manera clara y precisa usando las herramientas disponibles.
+
+Las herramientas que reciben JSON listan sus campos; * indica un campo obligatorio, campo[] una lista, campo{} un diccionario y campo[...] una lista de objetos con esos campos.
+Los valores entre comillas separados por | son las opciones que espera ese campo.
+Las herramientas que crean, actualizan o eliminan registros devuelven "done" si la operación fue exitosa; las de consulta devuelven los datos (normalmente en JSON).
+Si una herramienta falla, su respuesta empieza con "failed: <motivo>" o describe el error.
+
+TOOLS:
+------
+
+Assistant has access to the following tools:"""
+
+FIELD_LINE = re.compile(r"^(\s*)- `(\w+)`:(.*)$")
+QUOTED_VALUE = re.compile(r'"([^"]+)"')
+# Los ejemplos ("e.g. ...", "Defaults to ...") y los JSON/listas dentro de una descripción
+# no son los valores permitidos del campo
+INLINE_EXAMPLE = re.compile(r'\be\.g\.,?(?:\{[^}]*\}|\[[^\]]*\]|"[^"]*"|[^.()"{\[])*|Defaults to [^.]*|\{[^}]*\}|\[[^\]]*\]')
+ALLOWED_VALUES = re.compile(r"\bmust be\b|\bor\b")
+FORMAT_VALUE = re.compile(r'"([^"]+)" format\b')
+LIST_TYPE = re.compile(r"\blist\b", re.IGNORECASE)
+DICT_TYPE = re.compile(r"\bdict(ionary)?\b", re.IGNORECASE)
+
+# Catálogo y prompt ya renderizados, por conjunto de herramientas
+_agent_configurations = {}
+
+
+def compact_tool_description(description: str) -> str:
+    """
+    Renders a tool docstring as a single catalog line: its summary plus either the JSON
+    fields (nested lists in brackets, quoted example values kept as hints) or the plain input.
+    """
+    summary, plain_input, fields = [], [], []
+    section = "summary"
+    field_indent = None
+    for line in description.strip().splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("Expected input:") or stripped == "Args:":
+            section = "input"
+            if stripped.startswith("Expected input:") and "JSON" not in stripped:
+                plain_input.append(stripped[len("Expected input:"):].strip())
+            continue
+        if stripped.startswith("Returns"):
+            section = "returns"
+            continue
+
+        field = FIELD_LINE.match(line)
+        if section == "input" and field:
+            indent, name, text = field.groups()
+            if field_indent is None:
+                field_indent = len(indent)
+            if len(indent) > field_indent and fields:
+                fields[-1][2].append(render_field(name, text))
+            else:
+                fields.append((name, text, []))
+        elif section == "input":
+            # Formato "Args:" -> "nombre (tipo): descripción"
+            plain_input.append(stripped.split(":", 1)[-1].strip())
+        elif section == "summary":
+            summary.append(stripped)
+
+    rendered = " ".join(summary)
+    if fields:
+        rendered_fields = ", ".join(render_field(name, text, nested) for name, text, nested in fields)
+        rendered += f" Input JSON: {rendered_fields}"
+    elif plain_input:
+        rendered += f" Input: {' '.join(plain_input)}"
+    return rendered
+
+
+def render_field(name: str, text: str, nested: Optional[list] = None) -> str:
+    """
+    Renders a JSON field as `name*{}`/`name[]`/`name[nested, ...]`, followed by its allowed
+    values (only when the docstring says "must be"/"or") or its format.
+    """
+    rendered = name + ("*" if "mandatory" in text else "")
+    if nested:
+        rendered += f"[{', '.join(nested)}]"
+    elif DICT_TYPE.search(text):
+        rendered += "{}"
+    elif LIST_TYPE.search(text):
+        rendered += "[]"
+
+    text = INLINE_EXAMPLE.sub("", text)
+    values = list(dict.fromkeys(QUOTED_VALUE.findall(text)))
+    value_format = FORMAT_VALUE.search(text)
+    if values and ALLOWED_VALUES.search(text):
+        rendered += " (" + "|".join(f'"{value}"' for value in values) + ")"
+    elif value_format:
+        rendered += f' ("{value_format.group(1)}" format)'
+    return rendered
+
+
+def get_agent_configuration(tools: list) -> tuple:
+    """
+    Returns `(tools, prompt)` for a conversational ReAct agent: tools deduplicated by name
+    with compact descriptions, and the prompt rendered once per tool set and reused.
+    """
+    unique_tools = list({tool.name: tool for tool in tools}.values())
+    key = tuple(tool.name for tool in unique_tools)
+    if key not in _agent_configurations:
+        compact_tools = [
+            tool.copy(update={"description": compact_tool_description(tool.description)})
+            for tool in unique_tools
+        ]
+        prompt = ConversationalAgent.create_prompt(compact_tools, prefix=PROMPT_PREFIX)
+        _agent_configurations[key] = (compact_tools, prompt)
+    return _agent_configurations[key]
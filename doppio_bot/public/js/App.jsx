@@ -3,7 +3,36 @@ import { nanoid } from 'nanoid'
 
 import ChatView from "./ChatView";
 
+// The session survives page reloads so its history can be resumed;
+// the key is per user so people sharing a browser don't share sessions
+function getSessionIDStorageKey() {
+	return `doppio_bot_session_id:${frappe.session.user}`;
+}
+
+function getStoredSessionID() {
+	let sessionID = localStorage.getItem(getSessionIDStorageKey());
+	if (!sessionID) {
+		sessionID = nanoid();
+		localStorage.setItem(getSessionIDStorageKey(), sessionID);
+	}
+	return sessionID;
+}
+
 export function App() {
 	// Unique sessionID for chat memory/history
-	return <ChatView sessionID={nanoid()} />;
+	const [sessionID, setSessionID] = React.useState(getStoredSessionID);
+
+	const startNewSession = () => {
+		const newSessionID = nanoid();
+		localStorage.setItem(getSessionIDStorageKey(), newSessionID);
+		setSessionID(newSessionID);
+	};
+
+	return (
+		<ChatView
+			key={sessionID}
+			sessionID={sessionID}
+			onNewSession={startNewSession}
+		/>
+	);
 }
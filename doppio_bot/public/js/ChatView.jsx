@@ -1,7 +1,6 @@
 import {
   Flex,
   IconButton,
-  VStack,
   Box,
   Card,
   CardBody,
@@ -9,12 +8,33 @@ import {
   useToast,
   Textarea,
   Text,
+  Button,
+  Spinner,
 } from "@chakra-ui/react";
 import { SendIcon } from "lucide-react";
-import React, { useState } from "react";
+import React, { useCallback, useEffect, useState } from "react";
+import { nanoid } from "nanoid";
 import Message from "./components/message/Message";
+import VirtualMessageList from "./components/message/VirtualMessageList";
 
-const ChatView = ({ sessionID }) => {
+const HISTORY_PAGE_LENGTH = 20;
+
+const getMessageKey = (message) => message.id;
+
+const GREETING_MESSAGE = {
+  id: "greeting",
+  from: "ai",
+  isLoading: false,
+  content: "Hazme una pregunta",
+};
+
+// The session belongs to someone else (e.g. another user logged in on this browser)
+const isPermissionError = (error) =>
+  error?.status === 403 ||
+  error?.exc_type === "PermissionError" ||
+  error?.responseJSON?.exc_type === "PermissionError";
+
+const ChatView = ({ sessionID, onNewSession }) => {
   // from Frappe!
   const userImageURL = frappe.user.image();
   const userFullname = frappe.user.full_name();
@@ -22,23 +42,75 @@ const ChatView = ({ sessionID }) => {
   const toast = useToast();
   const [promptMessage, setPromptMessage] = useState("");
 
-  const [messages, setMessages] = useState([
-    {
-      from: "ai",
-      isLoading: false,
-      content: "Hazme una pregunta",
-    },
-  ]);
+  const [messages, setMessages] = useState([]);
+  const [hasLoadedHistory, setHasLoadedHistory] = useState(false);
+  // Chronological index of the oldest message loaded from the server
+  const [firstIndex, setFirstIndex] = useState(null);
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
+  const [isLoadingHistory, setIsLoadingHistory] = useState(false);
+
+  const loadHistory = (before) => {
+    setIsLoadingHistory(true);
+    const args = { session_id: sessionID, page_length: HISTORY_PAGE_LENGTH };
+    // null would be sent as an empty string, so the latest page omits `before`
+    if (before !== null) {
+      args.before = before;
+    }
+    return frappe
+      .call("doppio_bot.history.get_chat_history", args)
+      .then(({ message: page }) => {
+        // chronological indices are stable, so they make stable ids too
+        const olderMessages = page.messages.map((message, index) => ({
+          ...message,
+          id: `history-${page.first_index + index}`,
+          isLoading: false,
+        }));
+        setMessages((old) => {
+          const merged = [...olderMessages, ...old];
+          // the greeting is only shown for sessions without history
+          return merged.length ? merged : [GREETING_MESSAGE];
+        });
+        setFirstIndex(page.first_index);
+        setHasOlderMessages(page.has_more);
+      })
+      .catch((e) => {
+        console.error(e);
+        if (isPermissionError(e)) {
+          onNewSession();
+          return;
+        }
+        toast({
+          title: "Could not load chat history, check console",
+          status: "error",
+          position: "bottom-right",
+        });
+      })
+      .finally(() => {
+        setIsLoadingHistory(false);
+        setHasLoadedHistory(true);
+      });
+  };
+
+  useEffect(() => {
+    loadHistory(null);
+  }, [sessionID]);
+
+  const handleStartReached = () => {
+    if (hasOlderMessages && !isLoadingHistory) {
+      loadHistory(firstIndex);
+    }
+  };
 
   const handleSendMessage = () => {
     if (!promptMessage.trim().length) {
       return;
     }
 
+    const responseID = nanoid();
     setMessages((old) => [
       ...old,
-      { from: "human", content: promptMessage, isLoading: false },
-      { from: "ai", content: "", isLoading: true },
+      { id: nanoid(), from: "human", content: promptMessage, isLoading: false },
+      { id: responseID, from: "ai", content: "", isLoading: true },
     ]);
     setPromptMessage("");
 
@@ -48,17 +120,21 @@ const ChatView = ({ sessionID }) => {
         session_id: sessionID,
       })
       .then((response) => {
-        setMessages((old) => {
-          old.splice(old.length - 1, 1, {
-            from: "ai",
-            content: response.message,
-            isLoading: false,
-          });
-          return [...old];
-        });
+        // only the answered message changes, every other message keeps its identity
+        setMessages((old) =>
+          old.map((message) =>
+            message.id === responseID
+              ? { ...message, content: response.message, isLoading: false }
+              : message
+          )
+        );
       })
       .catch((e) => {
         console.error(e);
+        if (isPermissionError(e)) {
+          onNewSession();
+          return;
+        }
         toast({
           title: "Something went wrong, check console",
           status: "error",
@@ -67,6 +143,15 @@ const ChatView = ({ sessionID }) => {
       });
   };
 
+  const renderMessage = useCallback(
+    (message) => (
+      <Flex direction={"column"} px={"2"} py={"1"}>
+        <Message message={message} />
+      </Flex>
+    ),
+    []
+  );
+
   return (
     <Flex
       direction={"column"}
@@ -75,21 +160,32 @@ const ChatView = ({ sessionID }) => {
       maxWidth={"4xl"}
       mx={"auto"}
     >
-      <Text fontSize="xl" fontWeight={"bold"} textColor={"gray.700"}>Pregúntale a Cube Bot</Text>
+      <Flex justify={"space-between"} alignItems={"center"}>
+        <Text fontSize="xl" fontWeight={"bold"} textColor={"gray.700"}>Pregúntale a Cube Bot</Text>
+        <Button size={"sm"} variant={"ghost"} onClick={onNewSession}>
+          Nueva conversación
+        </Button>
+      </Flex>
       {/* Chat Area */}
       <Box
         width={"100%"}
         height={"100%"}
-        overflowY="scroll"
         shadow={"xl"}
         rounded={"md"}
         backgroundColor={"white"}
       >
-        <VStack spacing={2} align="stretch" p={"2"}>
-          {messages.map((message) => {
-            return <Message key={message.content} message={message} />;
-          })}
-        </VStack>
+        {/* Only the messages in view are mounted, so long sessions stay responsive */}
+        {hasLoadedHistory ? (
+          <VirtualMessageList
+            items={messages}
+            getKey={getMessageKey}
+            renderItem={renderMessage}
+            onStartReached={handleStartReached}
+            header={isLoadingHistory ? <HistoryLoadingHeader /> : null}
+          />
+        ) : (
+          <HistoryLoadingHeader />
+        )}
       </Box>
 
       {/* Prompt Area */}
@@ -123,4 +219,12 @@ const ChatView = ({ sessionID }) => {
   );
 };
 
+const HistoryLoadingHeader = () => {
+  return (
+    <Flex justify={"center"} p={"2"}>
+      <Spinner size={"sm"} />
+    </Flex>
+  );
+};
+
 export default ChatView;
@@ -7,7 +7,7 @@ import MessageLoadingSkeletonText from "./MessageLoadingSkeletonText";
 const Message = ({ message }) => {
   const fromAI = message.from === "ai";
   return (
-    <MessageBubble key={message.content} fromAI={fromAI}>
+    <MessageBubble fromAI={fromAI}>
       {!message.isLoading ? (
         <MessageRenderer content={message.content} />
       ) : (
@@ -17,4 +17,5 @@ const Message = ({ message }) => {
   );
 };
 
-export default Message;
+// Messages are replaced immutably, so unchanged ones skip re-rendering
+export default React.memo(Message);
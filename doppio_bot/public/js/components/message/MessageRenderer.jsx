@@ -24,15 +24,36 @@ import { atomDark } from "react-syntax-highlighter/dist/esm/styles/prism";
 
 import CopyToClipboardButton from "./CopyToClipboardButton";
 
+const remarkPlugins = [remarkGfm];
+const rehypePlugins = [rehypeRaw];
+
+// Rendered markdown trees by content, so a message that scrolls back into the
+// virtualized list is not parsed and highlighted again
+const MARKDOWN_CACHE_SIZE = 500;
+const markdownCache = new Map();
+
+const renderMarkdown = (content) => {
+  if (markdownCache.has(content)) {
+    return markdownCache.get(content);
+  }
+
+  // react-markdown renders synchronously without hooks, so its output can be kept
+  const rendered = ReactMarkdown({
+    children: content,
+    components: markdownRenderComponentOverrides,
+    remarkPlugins,
+    rehypePlugins,
+  });
+
+  if (markdownCache.size >= MARKDOWN_CACHE_SIZE) {
+    markdownCache.delete(markdownCache.keys().next().value);
+  }
+  markdownCache.set(content, rendered);
+  return rendered;
+};
+
 const MessageRenderer = ({ content }) => {
-  return (
-    <ReactMarkdown
-      children={content}
-      components={markdownRenderComponentOverrides}
-      remarkPlugins={[remarkGfm]}
-      rehypePlugins={[rehypeRaw]}
-    />
-  );
+  return renderMarkdown(content);
 };
 
 const markdownRenderComponentOverrides = {
@@ -64,11 +85,10 @@ const markdownRenderComponentOverrides = {
       <SyntaxHighlighter
         {...props}
         children={codeString}
+        codeString={codeString}
         style={atomDark}
         language={match[1]}
-        PreTag={(props) => (
-          <PreWithClickToCopyButton codeString={codeString} {...props} />
-        )}
+        PreTag={PreWithClickToCopyButton}
       />
     ) : (
       <code {...props} className={className}>
@@ -93,4 +113,4 @@ const PreWithClickToCopyButton = (props) => {
   );
 };
 
-export default MessageRenderer;
+export default React.memo(MessageRenderer);
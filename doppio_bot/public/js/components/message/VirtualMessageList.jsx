@@ -0,0 +1,169 @@
+import * as React from "react";
+
+import { Box } from "@chakra-ui/react";
+
+// Height assumed for a message until it has been rendered and measured
+const ESTIMATED_ITEM_HEIGHT = 80;
+// Extra pixels rendered above and below the viewport
+const OVERSCAN = 600;
+// Distance from the edges that counts as "at the top/bottom"
+const EDGE_THRESHOLD = 48;
+
+// Index of the last item whose offset is <= position
+const findIndex = (offsets, position) => {
+  let low = 0;
+  let high = offsets.length - 2;
+  while (low < high) {
+    const mid = Math.ceil((low + high) / 2);
+    if (offsets[mid] <= position) {
+      low = mid;
+    } else {
+      high = mid - 1;
+    }
+  }
+  return Math.max(low, 0);
+};
+
+const MeasuredItem = ({ itemKey, onResize, children }) => {
+  const ref = React.useRef(null);
+
+  React.useLayoutEffect(() => {
+    const element = ref.current;
+    onResize(itemKey, element.offsetHeight);
+    const observer = new ResizeObserver(() =>
+      onResize(itemKey, element.offsetHeight)
+    );
+    observer.observe(element);
+    return () => observer.disconnect();
+  }, [itemKey, onResize]);
+
+  return <div ref={ref}>{children}</div>;
+};
+
+/**
+ * Windowed list for chat messages: only the items around the viewport are
+ * mounted, with variable heights measured as they render. Sticks to the bottom
+ * while the user is there, and keeps the scroll position when older items are
+ * prepended (calling `onStartReached` near the top).
+ */
+const VirtualMessageList = ({
+  items,
+  getKey,
+  renderItem,
+  onStartReached,
+  header,
+}) => {
+  const containerRef = React.useRef(null);
+  const heightsRef = React.useRef(new Map());
+  const isAtBottomRef = React.useRef(true);
+  const previousFirstKeyRef = React.useRef(null);
+  const [heightsVersion, setHeightsVersion] = React.useState(0);
+  const [viewport, setViewport] = React.useState({ top: 0, height: 0 });
+
+  const offsets = React.useMemo(() => {
+    const result = new Array(items.length + 1);
+    result[0] = 0;
+    items.forEach((item, index) => {
+      const height = heightsRef.current.get(getKey(item));
+      result[index + 1] = result[index] + (height ?? ESTIMATED_ITEM_HEIGHT);
+    });
+    return result;
+  }, [items, heightsVersion]);
+
+  const offsetsRef = React.useRef(offsets);
+  offsetsRef.current = offsets;
+  const itemsRef = React.useRef(items);
+  itemsRef.current = items;
+
+  const handleResize = React.useCallback((key, height) => {
+    const previous = heightsRef.current.get(key) ?? ESTIMATED_ITEM_HEIGHT;
+    if (previous === height && heightsRef.current.has(key)) return;
+    heightsRef.current.set(key, height);
+
+    // Items above the viewport changing height would push the visible ones around
+    const container = containerRef.current;
+    const index = itemsRef.current.findIndex((item) => getKey(item) === key);
+    if (
+      container &&
+      index >= 0 &&
+      !isAtBottomRef.current &&
+      offsetsRef.current[index + 1] <= container.scrollTop
+    ) {
+      container.scrollTop += height - previous;
+    }
+    setHeightsVersion((version) => version + 1);
+  }, []);
+
+  const updateViewport = () => {
+    const container = containerRef.current;
+    if (!container) return;
+
+    isAtBottomRef.current =
+      container.scrollHeight - container.scrollTop - container.clientHeight <
+      EDGE_THRESHOLD;
+    setViewport({ top: container.scrollTop, height: container.clientHeight });
+
+    if (container.scrollTop < EDGE_THRESHOLD && onStartReached) {
+      onStartReached();
+    }
+  };
+
+  React.useLayoutEffect(() => {
+    const container = containerRef.current;
+    if (!container) return;
+
+    // Older items were prepended: keep the previous first item where it was
+    const firstKey = items.length ? getKey(items[0]) : null;
+    const previousIndex = items.findIndex(
+      (item) => getKey(item) === previousFirstKeyRef.current
+    );
+    if (previousIndex > 0 && !isAtBottomRef.current) {
+      container.scrollTop += offsets[previousIndex];
+    }
+    previousFirstKeyRef.current = firstKey;
+
+    if (isAtBottomRef.current) {
+      container.scrollTop = container.scrollHeight;
+    }
+    setViewport({ top: container.scrollTop, height: container.clientHeight });
+  }, [items, offsets]);
+
+  // A page that doesn't fill the container never fires a scroll event, so the
+  // top edge is also checked whenever the items or the handler change
+  React.useEffect(() => {
+    const container = containerRef.current;
+    if (container && container.scrollTop < EDGE_THRESHOLD && onStartReached) {
+      onStartReached();
+    }
+  }, [items, offsets, onStartReached]);
+
+  const totalHeight = offsets[items.length];
+  const start = findIndex(offsets, Math.max(viewport.top - OVERSCAN, 0));
+  const end = Math.min(
+    findIndex(offsets, viewport.top + viewport.height + OVERSCAN) + 1,
+    items.length
+  );
+
+  return (
+    <Box
+      ref={containerRef}
+      height={"100%"}
+      overflowY={"auto"}
+      onScroll={updateViewport}
+    >
+      {header}
+      <div style={{ paddingTop: offsets[start], paddingBottom: totalHeight - offsets[end] }}>
+        {items.slice(start, end).map((item) => {
+          const key = getKey(item);
+          return (
+            <MeasuredItem key={key} itemKey={key} onResize={handleResize}>
+              {renderItem(item)}
+            </MeasuredItem>
+          );
+        })}
+      </div>
+    </Box>
+  );
+};
+
+export default VirtualMessageList;
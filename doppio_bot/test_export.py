@@ -0,0 +1,48 @@
+# Copyright (c) 2026, Hussain Nagaria and Contributors
+# See license.txt
+
+from datetime import date
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from doppio_bot.export import get_period_filter, normalize_filters, validate_export_fields
+
+
+class FixedDate(date):
+	@classmethod
+	def today(cls):
+		return date(2024, 3, 15)
+
+
+class TestExport(FrappeTestCase):
+	def test_normalize_filters(self):
+		self.assertEqual(
+			normalize_filters({"status": "Paid", "grand_total": [">", 100]}),
+			[["status", "=", "Paid"], ["grand_total", ">", 100]],
+		)
+		self.assertEqual(normalize_filters([("status", "=", "Paid")]), [["status", "=", "Paid"]])
+		self.assertEqual(normalize_filters(None), [])
+
+	@patch("doppio_bot.export.date", FixedDate)
+	def test_get_period_filter(self):
+		self.assertEqual(
+			get_period_filter("posting_date", "this_month"),
+			["posting_date", "between", [date(2024, 3, 1), date(2024, 3, 15)]],
+		)
+		self.assertEqual(
+			get_period_filter("posting_date", "last_month"),
+			["posting_date", "between", [date(2024, 2, 1), date(2024, 2, 29)]],
+		)
+		self.assertEqual(
+			get_period_filter("posting_date", "this_year"),
+			["posting_date", "between", [date(2024, 1, 1), date(2024, 3, 15)]],
+		)
+		self.assertRaises(frappe.ValidationError, get_period_filter, "posting_date", "last_week")
+
+	def test_child_table_fields_are_rejected(self):
+		validate_export_fields("DoppioBot Batch Job", ["name", "status", "creation"])
+		self.assertRaises(
+			frappe.ValidationError, validate_export_fields, "DoppioBot Batch Job", ["`tabDoppioBot Batch Job Row`.instruction"]
+		)
@@ -0,0 +1,57 @@
+# Copyright (c) 2026, Hussain Nagaria and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from doppio_bot.prompts import compact_tool_description
+
+
+class TestPrompts(FrappeTestCase):
+	def test_compact_json_description(self):
+		description = """
+		Create a sales order.
+		Expected input: JSON string with the following fields:
+		- `customer`: The customer name (mandatory).
+		- `order_type`: (optional) "Sales" or "Shopping Cart", e.g. {"order_type": "Sales"}.
+		- `items`: List of items (mandatory), each with:
+		    - `item_code`: The item code (mandatory).
+		    - `qty`: The quantity (mandatory).
+		Returns "done" if successful, otherwise "failed".
+		"""
+		self.assertEqual(
+			compact_tool_description(description),
+			'Create a sales order. Input JSON: customer*, order_type ("Sales"|"Shopping Cart"), items*[item_code*, qty*]',
+		)
+
+	def test_compact_field_types_and_values(self):
+		description = """
+		Export records to a file.
+		Expected input: JSON string with the following fields:
+		- `doctype`: The DocType to query, e.g. "Sales Invoice", "Customer" (mandatory).
+		- `fields`: (optional) List of fields to include. Defaults to ["name"].
+		- `filters`: (optional) Dictionary of filters, e.g. {"customer": "ACME", "docstatus": 1}.
+		- `taxes`: (optional) A list of taxes to apply.
+		- `due_date`: (optional) Invoice due date in "YYYY-MM-DD" format.
+		- `date_field`: (optional) Date field. Defaults to "posting_date" or "creation".
+		- `id_identificacion`: (optional) Identification type, must be "NIT" or "CUI".
+		"""
+		self.assertEqual(
+			compact_tool_description(description),
+			"Export records to a file. Input JSON: doctype*, fields[], filters{}, taxes[], "
+			'due_date ("YYYY-MM-DD" format), date_field, id_identificacion ("NIT"|"CUI")',
+		)
+
+	def test_compact_args_description(self):
+		description = """
+		Look up a tax id in the SAT.
+
+		Args:
+		    identificacion (str): NIT or CUI to look up.
+
+		Returns:
+		    str: The registered name.
+		"""
+		self.assertEqual(
+			compact_tool_description(description),
+			"Look up a tax id in the SAT. Input: NIT or CUI to look up.",
+		)
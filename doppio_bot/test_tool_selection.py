@@ -0,0 +1,40 @@
+# Copyright (c) 2026, Hussain Nagaria and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from doppio_bot.tool_selection import INTENT_TOOLS, classify_intents, select_tools
+
+
+class TestToolSelection(FrappeTestCase):
+	def setUp(self):
+		self.tools = [frappe._dict(name=name) for names in INTENT_TOOLS.values() for name in names]
+
+	def select(self, prompt_message, previous_message=None):
+		return {tool.name for tool in select_tools(self.tools, prompt_message, previous_message, user="Administrator")}
+
+	def test_classify_intents(self):
+		self.assertEqual(classify_intents("Crea una factura para ACME"), {"sales"})
+		self.assertEqual(classify_intents("hola"), {"analytics"})
+		self.assertIn("customers", classify_intents("Consulta el NIT 123456789"))
+
+	def test_sales_and_customer_questions_get_read_only_tools(self):
+		for prompt_message in ("¿Cómo van las ventas?", "Ventas de la semana pasada", "dame las ventas de ayer"):
+			selected = self.select(prompt_message)
+			self.assertIn("get_sales_stats", selected, prompt_message)
+			self.assertIn("export_query_results", selected, prompt_message)
+
+		self.assertIn("export_query_results", self.select("Muéstrame los clientes"))
+
+	def test_destructive_tools_need_explicit_request(self):
+		selected = self.select("Actualiza el cliente ACME")
+		self.assertIn("update_customers", selected)
+		self.assertNotIn("delete_customers", selected)
+
+		self.assertIn("delete_customers", self.select("Elimina el cliente ACME"))
+
+	def test_previous_message_does_not_unlock_destructive_tools(self):
+		selected = self.select("Ahora actualiza el cliente ACME", previous_message="Elimina el cliente Foo")
+		self.assertIn("update_customers", selected)
+		self.assertNotIn("delete_customers", selected)
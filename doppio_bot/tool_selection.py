@@ -0,0 +1,97 @@
+import frappe
+import re
+import unicodedata
+from typing import Optional
+
+# Palabras clave (sin tildes, se comparan como prefijo de palabra) de cada intención
+INTENT_KEYWORDS = {
+    "analytics": ["cuanto", "total", "estadistica", "reporte", "informe", "lista", "todas", "todos", "exporta",
+                  "informacion", "precio", "costo", "rotacion", "ultim", "stock", "existencia", "mes", "ano"],
+    "sales": ["factura", "venta", "vende", "pedido", "orden", "cotizacion", "invoice", "order", "sale"],
+    "purchases": ["compra", "proveedor", "supplier", "purchase"],
+    "customers": ["cliente", "customer", "nit", "cui"],
+    "items": ["articulo", "producto", "item", "inventario"],
+}
+
+INTENT_TOOLS = {
+    "analytics": ["get_info_customer", "get_item_stats", "get_sales_stats", "export_query_results", "consultar_identificacion_sat"],
+    "sales": ["create_sales_invoice", "create_sales_order", "get_info_customer", "get_item_stats", "get_sales_stats",
+              "export_query_results", "consultar_identificacion_sat"],
+    "purchases": ["create_purchase_invoice", "create_suppliers", "get_item_stats"],
+    "customers": ["create_customer", "update_customers", "delete_customers", "get_info_customer", "export_query_results",
+                  "consultar_identificacion_sat"],
+    "items": ["create_item", "get_item_stats"],
+}
+
+# Las herramientas destructivas solo se ofrecen cuando el usuario lo pide explícitamente
+DESTRUCTIVE_TOOL_KEYWORDS = {
+    "delete_customers": ["elimin", "borr", "delete", "remove"],
+}
+
+# Permiso que necesita el usuario para que se le ofrezca cada herramienta
+TOOL_PERMISSIONS = {
+    "create_sales_invoice": ("Sales Invoice", "create"),
+    "create_sales_order": ("Sales Order", "create"),
+    "create_purchase_invoice": ("Purchase Invoice", "create"),
+    "create_suppliers": ("Supplier", "create"),
+    "create_customer": ("Customer", "create"),
+    "update_customers": ("Customer", "write"),
+    "delete_customers": ("Customer", "delete"),
+    "get_info_customer": ("Customer", "read"),
+    "create_item": ("Item", "create"),
+    "get_item_stats": ("Item", "read"),
+    "get_sales_stats": ("Sales Invoice", "read"),
+}
+
+DEFAULT_INTENT = "analytics"
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def contains_keyword(text: str, keywords: list) -> bool:
+    return any(re.search(rf"\b{re.escape(keyword)}", text) for keyword in keywords)
+
+
+def classify_intents(text: str) -> set:
+    """
+    Cheap local intent classification by keywords. Falls back to the read-only
+    analytics intent when nothing matches.
+    """
+    text = normalize_text(text)
+    intents = {intent for intent, keywords in INTENT_KEYWORDS.items() if contains_keyword(text, keywords)}
+    return intents or {DEFAULT_INTENT}
+
+
+def has_tool_permission(tool_name: str, user: Optional[str] = None) -> bool:
+    permission = TOOL_PERMISSIONS.get(tool_name)
+    if not permission:
+        return True
+    doctype, ptype = permission
+    return frappe.has_permission(doctype, ptype, user=user)
+
+
+def select_tools(tools: list, prompt_message: str, previous_message: Optional[str] = None, user: Optional[str] = None) -> list:
+    """
+    Returns the subset of `tools` relevant to the intents of the message (and the previous
+    one, so follow-ups like "sí, créala" keep their context) that the user is allowed to use.
+    Destructive tools are only offered when the current message asks for them.
+    """
+    intents = classify_intents(" ".join(filter(None, [previous_message, prompt_message])))
+    tool_names = {name for intent in intents for name in INTENT_TOOLS[intent]}
+
+    normalized_prompt = normalize_text(prompt_message)
+    for tool_name, keywords in DESTRUCTIVE_TOOL_KEYWORDS.items():
+        if not contains_keyword(normalized_prompt, keywords):
+            tool_names.discard(tool_name)
+
+    return [tool for tool in tools if tool.name in tool_names and has_tool_permission(tool.name, user)]
+
+
+def get_previous_human_message(message_history) -> Optional[str]:
+    for message in reversed(message_history.messages):
+        if message.type == "human":
+            return message.content
+    return None
@@ -0,0 +1,165 @@
+import frappe
+import json
+from typing import Optional
+from frappe.utils import cint, nowdate
+from langchain.callbacks.base import BaseCallbackHandler
+
+# Los contadores se acumulan en Redis y un job programado los vuelca a la base
+# de datos, así una conversación nunca escribe directamente en `DoppioBot Token Usage`.
+USAGE_BUFFER_KEY = "doppio_bot|token_usage|buffer"
+USAGE_FLUSH_KEY = "doppio_bot|token_usage|flushing"
+DAILY_TOTAL_KEY = "doppio_bot|token_usage|{day}|{scope}"
+DAILY_TOTAL_TTL = 2 * 24 * 60 * 60
+USAGE_FIELDS = ("llm_calls", "prompt_tokens", "completion_tokens")
+
+
+class TokenUsageCallbackHandler(BaseCallbackHandler):
+    """
+    Accumulates the tokens of every LLM call made during one agent run,
+    including each ReAct step and the retries caused by `handle_parsing_errors`.
+    """
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        prompt_tokens, completion_tokens = get_usage_from_llm_result(response)
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+
+def get_usage_from_llm_result(response) -> tuple:
+    """
+    Extracts (prompt_tokens, completion_tokens) from a LangChain `LLMResult`.
+    Chat models report usage on each generated message, older integrations in `llm_output`.
+    """
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None) or (generation.generation_info or {}).get("usage_metadata") or {}
+            prompt_tokens += cint(usage.get("input_tokens") or usage.get("prompt_token_count"))
+            completion_tokens += cint(usage.get("output_tokens") or usage.get("candidates_token_count"))
+
+    if not (prompt_tokens or completion_tokens):
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = cint(token_usage.get("prompt_tokens"))
+        completion_tokens = cint(token_usage.get("completion_tokens"))
+
+    return prompt_tokens, completion_tokens
+
+
+def get_daily_total_key(scope: str, day: Optional[str] = None) -> str:
+    return frappe.cache().make_key(DAILY_TOTAL_KEY.format(day=day or nowdate(), scope=scope))
+
+
+def record_usage(session_id: str, model: str, handler: TokenUsageCallbackHandler, user: Optional[str] = None):
+    """
+    Adds the usage collected by `handler` to the Redis buffer and to the daily
+    per-user and per-site totals used for budget enforcement.
+    """
+    if not handler.llm_calls:
+        return
+
+    cache = frappe.cache()
+    user = user or frappe.session.user
+    day = nowdate()
+    total_tokens = handler.prompt_tokens + handler.completion_tokens
+    buffer_key = cache.make_key(USAGE_BUFFER_KEY)
+
+    # Se usa un pipeline crudo: los helpers de RedisWrapper serializan con pickle
+    pipe = cache.pipeline()
+    for fieldname in USAGE_FIELDS:
+        field = json.dumps([day, user, session_id, model, fieldname])
+        pipe.hincrby(buffer_key, field, getattr(handler, fieldname))
+    for scope in ("site", f"user:{user}"):
+        key = get_daily_total_key(scope, day)
+        pipe.incrby(key, total_tokens)
+        pipe.expire(key, DAILY_TOTAL_TTL)
+    pipe.execute()
+
+
+def get_tokens_used_today(scope: str) -> int:
+    return cint(frappe.cache().pipeline().get(get_daily_total_key(scope)).execute()[0])
+
+
+def is_token_budget_exceeded(user: Optional[str] = None) -> bool:
+    """
+    Checks today's usage against the daily limits in DoppioBot Settings.
+    A limit of 0 means unlimited.
+    """
+    settings = frappe.get_cached_doc("DoppioBot Settings")
+    user = user or frappe.session.user
+
+    user_limit = cint(settings.get("daily_user_token_limit"))
+    if user_limit and get_tokens_used_today(f"user:{user}") >= user_limit:
+        return True
+
+    site_limit = cint(settings.get("daily_site_token_limit"))
+    if site_limit and get_tokens_used_today("site") >= site_limit:
+        return True
+
+    return False
+
+
+def flush_token_usage():
+    """
+    Scheduled job: moves the buffered counters from Redis into `DoppioBot Token Usage`,
+    one row per day, user, session and model.
+    """
+    cache = frappe.cache()
+    buffer_key = cache.make_key(USAGE_BUFFER_KEY)
+    flush_key = cache.make_key(USAGE_FLUSH_KEY)
+
+    flushing, buffered = cache.pipeline().exists(flush_key).exists(buffer_key).execute()
+    # Si quedó una clave de volcado es porque la ejecución anterior falló; se reintenta primero
+    if not flushing:
+        if not buffered:
+            return
+        # RENAME es atómico: los incrementos concurrentes caen en un buffer nuevo
+        cache.pipeline().rename(buffer_key, flush_key).execute()
+
+    raw_usage = cache.pipeline().hgetall(flush_key).execute()[0]
+
+    usage = {}
+    for field, value in raw_usage.items():
+        day, user, session_id, model, fieldname = json.loads(frappe.safe_decode(field))
+        counts = usage.setdefault((day, user, session_id, model), dict.fromkeys(USAGE_FIELDS, 0))
+        counts[fieldname] += cint(value)
+
+    for (day, user, session_id, model), counts in usage.items():
+        upsert_token_usage(day, user, session_id, model, counts)
+
+    frappe.db.commit()
+    cache.pipeline().delete(flush_key).execute()
+
+
+def upsert_token_usage(day: str, user: str, session_id: str, model: str, counts: dict):
+    name = frappe.db.get_value(
+        "DoppioBot Token Usage",
+        {"date": day, "user": user, "session_id": session_id, "model": model},
+    )
+    if name:
+        frappe.db.sql("""UPDATE `tabDoppioBot Token Usage`
+                         SET llm_calls = llm_calls + %(llm_calls)s,
+                             prompt_tokens = prompt_tokens + %(prompt_tokens)s,
+                             completion_tokens = completion_tokens + %(completion_tokens)s,
+                             total_tokens = total_tokens + %(prompt_tokens)s + %(completion_tokens)s,
+                             modified = NOW()
+                         WHERE name = %(name)s""", dict(counts, name=name))
+        return
+
+    frappe.get_doc({
+        "doctype": "DoppioBot Token Usage",
+        "date": day,
+        "user": user,
+        "session_id": session_id,
+        "model": model,
+        "llm_calls": counts["llm_calls"],
+        "prompt_tokens": counts["prompt_tokens"],
+        "completion_tokens": counts["completion_tokens"],
+        "total_tokens": counts["prompt_tokens"] + counts["completion_tokens"],
+    }).insert(ignore_permissions=True)